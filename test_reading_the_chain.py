@@ -0,0 +1,458 @@
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.providers.base import BaseProvider
+
+import reading_the_chain as rtc
+
+CONTRACT_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'contract_info.json')
+ADMIN_ADDRESS = "0xAC55e7d73A792fE1A9e051BDF4A010c33962809A"
+OWNER_ADDRESS = "0x793A37a85964D96ACD6368777c7C7050F05b11dE"
+
+
+class StubProvider(BaseProvider):
+	"""
+	Provider answering JSON-RPC requests from a dict of method -> handler(params)
+	Every request is recorded in self.requests
+	"""
+
+	def __init__(self, handlers=None, endpoint_uri='stub://chain'):
+		super().__init__()
+		self.handlers = handlers or {}
+		self.endpoint_uri = endpoint_uri
+		self.requests = []
+
+	def make_request(self, method, params):
+		self.requests.append((method, params))
+		return {'jsonrpc': '2.0', 'id': len(self.requests), 'result': self.handlers[method](params)}
+
+	def methods(self):
+		return [method for method, _ in self.requests]
+
+
+def make_contract(w3):
+	"""
+	Returns the assignment's BSC contract bound to w3
+	"""
+	info = rtc.load_contract_info(CONTRACT_JSON)['bsc']
+	return w3.eth.contract(address=info['address'], abi=info['abi'])
+
+
+def stub_contract(answers):
+	"""
+	Returns (provider, contract) where eth_call answers the contract's view functions from
+	answers (fn_name -> value), unpacking Multicall3 aggregate3 batches
+	"""
+	provider = StubProvider()
+	contract = make_contract(Web3(provider))
+	codec = contract.w3.codec
+	by_selector = {}
+	for fn_name, value in answers.items():
+		selector, _, output_types = rtc.function_abi_info(contract, fn_name)
+		by_selector[HexBytes(selector)] = codec.encode(output_types, [value])
+
+	def eth_call(params):
+		tx = params[0]
+		data = HexBytes(tx['data'])
+		if tx['to'].lower() == rtc.MULTICALL3_ADDRESS.lower():
+			(calls,) = codec.decode(['(address,bool,bytes)[]'], data[4:])
+			results = [(True, by_selector[HexBytes(call_data[:4])]) for _, _, call_data in calls]
+			return '0x' + codec.encode(['(bool,bytes)[]'], [results]).hex()
+		return '0x' + by_selector[data[:4]].hex()
+
+	provider.handlers['eth_call'] = eth_call
+	return provider, contract
+
+
+def eth_call_targets(provider):
+	"""
+	Returns the 'to' address of every eth_call sent to provider
+	"""
+	return [params[0]['to'] for method, params in provider.requests if method == 'eth_call']
+
+
+def make_block(rng, size, ordered):
+	"""
+	Builds a raw block of size transactions mixing legacy and EIP-1559 types
+	"""
+	base_fee = rng.randrange(0, 10**9)
+	transactions = []
+	for _ in range(size):
+		if rng.random() < 0.5:
+			transactions.append({'type': '0x0', 'gasPrice': hex(base_fee + rng.randrange(0, 10**10))})
+		else:
+			max_fee = base_fee + rng.randrange(0, 10**10)
+			transactions.append({
+				'type': '0x2',
+				'maxPriorityFeePerGas': hex(rng.randrange(0, 10**10)),
+				'maxFeePerGas': hex(max_fee),
+			})
+	if ordered:
+		transactions.sort(key=lambda tx: rtc.priority_fee(tx, base_fee), reverse=True)
+	return {'baseFeePerGas': hex(base_fee), 'transactions': transactions}
+
+
+def column_checks():
+	"""
+	Returns every available implementation of the column ordering check
+	"""
+	checks = [rtc.columns_are_ordered, rtc.ordered_columns_loop]
+	compiled = rtc.compiled_columns_loop()
+	if compiled is not None:
+		checks.append(compiled)
+	return checks
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 63, 64, 65, 200])
+def test_ordering_paths_agree(size):
+	pytest.importorskip('numpy')
+	rng = random.Random(size)
+	for i in range(50):
+		block = make_block(rng, size, ordered=i % 2 == 0)
+		base_fee = rtc.quantity(block, 'baseFeePerGas')
+		expected = rtc.fees_are_ordered(block['transactions'], base_fee)
+		if i % 2 == 0:
+			assert expected
+
+		assert rtc.block_is_ordered(block) == expected
+		columns = rtc.fee_columns(block['transactions'])
+		for check in column_checks():
+			assert bool(check(*columns, base_fee)) == expected, check
+
+
+@pytest.mark.parametrize('tx_type', ['0x0', '0x2'])
+def test_single_type_blocks(tx_type):
+	pytest.importorskip('numpy')
+	rng = random.Random(tx_type)
+	for i in range(20):
+		block = make_block(rng, 80, ordered=i % 2 == 0)
+		for tx in block['transactions']:
+			tx['type'] = tx_type
+			tx.setdefault('gasPrice', hex(rng.randrange(0, 10**10)))
+			tx.setdefault('maxPriorityFeePerGas', hex(rng.randrange(0, 10**10)))
+			tx.setdefault('maxFeePerGas', hex(rng.randrange(10**9, 10**11)))
+		base_fee = rtc.quantity(block, 'baseFeePerGas')
+		expected = rtc.fees_are_ordered(block['transactions'], base_fee)
+		assert rtc.block_is_ordered(block) == expected
+		columns = rtc.fee_columns(block['transactions'])
+		for check in column_checks():
+			assert bool(check(*columns, base_fee)) == expected, check
+
+
+@pytest.mark.parametrize('size', [63, 64, 65])
+def test_int64_overflow(size):
+	pytest.importorskip('numpy')
+	huge = 2**70
+	transactions = [{'type': '0x0', 'gasPrice': hex(huge - i)} for i in range(size)]
+	assert rtc.fee_columns(transactions) is None
+	assert rtc.block_is_ordered({'baseFeePerGas': '0x1', 'transactions': transactions})
+
+	# An inversion that only exists above int64 is still found by block_is_ordered
+	transactions[-1]['gasPrice'] = hex(huge + 1)
+	assert not rtc.block_is_ordered({'baseFeePerGas': '0x1', 'transactions': transactions})
+
+
+def test_empty_and_missing_fields():
+	assert rtc.block_is_ordered({'transactions': []})
+	assert rtc.block_is_ordered({'transactions': [{'gasPrice': '0x2'}, {'gasPrice': None}]})
+	assert not rtc.block_is_ordered({'transactions': [{'gasPrice': None}, {'gasPrice': '0x2'}]})
+
+
+def test_prepare_call_matches_encode_abi():
+	contract = make_contract(Web3())
+	calls = [
+		('merkleRoot', ()),
+		('hasRole', (rtc.DEFAULT_ADMIN_ROLE, ADMIN_ADDRESS)),
+		('getPrimeByOwner', (OWNER_ADDRESS,)),
+		('getPrimeByOwner', (ADMIN_ADDRESS,)),
+	]
+	for fn_name, args in calls:
+		calldata, _ = rtc.prepare_call(contract, fn_name, *args)
+		assert calldata == contract.encode_abi(fn_name, args=list(args))
+
+	# Only one entry per function, however many distinct arguments were encoded
+	cached = [key for key in rtc._FUNCTION_ABIS if key[0] == contract.address]
+	assert sorted(name for _, name in cached) == ['getPrimeByOwner', 'hasRole', 'merkleRoot']
+
+
+def test_result_cache_stays_bounded(monkeypatch):
+	monkeypatch.setattr(rtc, '_RESULT_CACHE', {})
+	monkeypatch.setattr(rtc, 'CONTRACT_CACHE_MAX_SIZE', 4)
+	rtc.store_result('expired', 0, now=0)
+	for i in range(3):
+		rtc.store_result(i, i, now=rtc.CONTRACT_CACHE_TTL)
+	assert len(rtc._RESULT_CACHE) == 4
+
+	# The expired entry goes first, then the oldest live ones
+	rtc.store_result(3, 3, now=rtc.CONTRACT_CACHE_TTL)
+	assert list(rtc._RESULT_CACHE) == [0, 1, 2, 3]
+	rtc.store_result(4, 4, now=rtc.CONTRACT_CACHE_TTL)
+	assert list(rtc._RESULT_CACHE) == [1, 2, 3, 4]
+
+
+def test_result_cache_is_per_provider(monkeypatch):
+	monkeypatch.setattr(rtc, '_RESULT_CACHE', {})
+	root_a, root_b = b'\xaa' * 32, b'\xbb' * 32
+	provider_a, contract_a = stub_contract({'merkleRoot': root_a})
+	provider_b, contract_b = stub_contract({'merkleRoot': root_b})
+	assert contract_a.address == contract_b.address
+
+	assert rtc.call_many(contract_a, [('merkleRoot', (), True)]) == [root_a]
+	assert rtc.call_many(contract_b, [('merkleRoot', (), True)]) == [root_b]
+	assert rtc.call_many(contract_a, [('merkleRoot', (), True)]) == [root_a]
+	assert len(eth_call_targets(provider_a)) == 1
+	assert len(eth_call_targets(provider_b)) == 1
+
+
+def test_call_many_uses_multicall_then_plain_call(monkeypatch):
+	monkeypatch.setattr(rtc, '_RESULT_CACHE', {})
+	root = b'\x12' * 32
+	provider, contract = stub_contract({'merkleRoot': root, 'hasRole': True, 'getPrimeByOwner': 7919})
+	calls = [
+		('merkleRoot', (), True),
+		('hasRole', (rtc.DEFAULT_ADMIN_ROLE, ADMIN_ADDRESS), True),
+		('getPrimeByOwner', (OWNER_ADDRESS,), False),
+	]
+
+	# Everything misses the cache: one aggregate3 call, decoded in request order
+	assert rtc.call_many(contract, calls) == [root, True, 7919]
+	assert eth_call_targets(provider) == [rtc.MULTICALL3_ADDRESS]
+
+	# Only the uncacheable call is left, so it goes out as a plain eth_call to the contract
+	assert rtc.call_many(contract, calls) == [root, True, 7919]
+	assert eth_call_targets(provider) == [rtc.MULTICALL3_ADDRESS, contract.address]
+
+	# Nothing pending: no request at all
+	assert rtc.call_many(contract, calls[:2]) == [root, True]
+	assert len(eth_call_targets(provider)) == 2
+
+
+def test_call_many_partial_hits(monkeypatch):
+	monkeypatch.setattr(rtc, '_RESULT_CACHE', {})
+	root = b'\x34' * 32
+	provider, contract = stub_contract({'merkleRoot': root, 'hasRole': False, 'getPrimeByOwner': 104729})
+	assert rtc.call_many(contract, [('merkleRoot', (), True)]) == [root]
+
+	# The cached middle call is filled in between the two batched ones
+	calls = [
+		('getPrimeByOwner', (OWNER_ADDRESS,), False),
+		('merkleRoot', (), True),
+		('hasRole', (rtc.DEFAULT_ADMIN_ROLE, ADMIN_ADDRESS), True),
+	]
+	assert rtc.call_many(contract, calls) == [104729, root, False]
+	assert eth_call_targets(provider) == [contract.address, rtc.MULTICALL3_ADDRESS]
+
+	# Expired entries are fetched again
+	monkeypatch.setattr(rtc.time, 'monotonic', lambda: float('inf'))
+	assert rtc.call_many(contract, [('merkleRoot', (), True)]) == [root]
+	assert eth_call_targets(provider)[-1] == contract.address
+	assert len(eth_call_targets(provider)) == 3
+
+
+def test_websocket_requests_are_serialized(monkeypatch):
+	active = []
+	overlaps = []
+
+	def slow_make_request(self, method, params):
+		active.append(method)
+		if len(active) > 1:
+			overlaps.append(method)
+		time.sleep(0.01)
+		active.pop()
+		return {'jsonrpc': '2.0', 'id': 1, 'result': params[0]}
+
+	monkeypatch.setattr(rtc.LegacyWebSocketProvider, 'make_request', slow_make_request)
+	provider = rtc.LockedWebSocketProvider('ws://127.0.0.1:1')
+	with ThreadPoolExecutor(max_workers=8) as executor:
+		results = list(executor.map(lambda i: provider.make_request('eth_getBlockByNumber', [i]), range(16)))
+
+	assert [result['result'] for result in results] == list(range(16))
+	assert overlaps == []
+
+
+def stub_chain(head=100, latest=None):
+	"""
+	Returns a Web3 on a StubProvider whose chain is at block head
+	Even blocks are ordered and odd ones are not; 'latest' returns block latest (default head)
+	"""
+	def get_block(params):
+		block_id, _ = params
+		number = (head if latest is None else latest) if block_id == 'latest' else int(block_id, 16)
+		fees = ['0x5', '0x4'] if number % 2 == 0 else ['0x4', '0x5']
+		transactions = [{'type': '0x0', 'gasPrice': fee} for fee in fees]
+		return {'number': hex(number), 'baseFeePerGas': '0x1', 'transactions': transactions}
+
+	return Web3(StubProvider({
+		'eth_getBlockByNumber': get_block,
+		'eth_chainId': lambda params: '0x61',
+		'eth_blockNumber': lambda params: hex(head),
+	}))
+
+
+@pytest.fixture
+def block_cache(tmp_path, monkeypatch):
+	"""
+	Enables the block cache in tmp_path with fresh in-memory state, returning the cache path
+	"""
+	path = str(tmp_path / 'blocks.sqlite')
+	monkeypatch.setattr(rtc, 'BLOCK_CACHE_PATH', path)
+	monkeypatch.setattr(rtc, '_CHAIN_IDS', {})
+	monkeypatch.setattr(rtc, '_CHAIN_HEADS', {})
+	monkeypatch.setattr(rtc, '_BLOCK_CACHE', None)
+	yield path
+	if rtc._BLOCK_CACHE is not None:
+		rtc._BLOCK_CACHE[1].close()
+
+
+def test_block_cache_miss_then_hit(block_cache, monkeypatch):
+	w3 = stub_chain()
+	assert rtc.scan_blocks(w3, 10, 12) == {10: True, 11: False}
+	assert sorted(w3.provider.methods()) == ['eth_blockNumber', 'eth_chainId', 'eth_getBlockByNumber', 'eth_getBlockByNumber']
+
+	w3.provider.requests.clear()
+	assert rtc.is_ordered_block(w3, 10)
+	assert not rtc.is_ordered_block(w3, 11)
+	assert w3.provider.methods() == []
+
+	# A later run reads the chain id from the cache file instead of asking for it
+	rtc._BLOCK_CACHE[1].close()
+	monkeypatch.setattr(rtc, '_BLOCK_CACHE', None)
+	monkeypatch.setattr(rtc, '_CHAIN_IDS', {})
+	w3 = stub_chain()
+	assert not rtc.is_ordered_block(w3, 11)
+	assert w3.provider.methods() == []
+
+
+def test_block_cache_skips_unconfirmed_blocks(block_cache):
+	w3 = stub_chain(head=100)
+	recent = 100 - rtc.BLOCK_CACHE_CONFIRMATIONS + 1
+	assert rtc.scan_blocks(w3, recent, recent + 1) == {recent: recent % 2 == 0}
+	assert rtc.is_ordered_block(w3, recent) == (recent % 2 == 0)
+	assert w3.provider.methods() == ['eth_blockNumber', 'eth_getBlockByNumber', 'eth_getBlockByNumber']
+
+	# One block deeper is final and cached
+	final = recent - 1
+	rtc.is_ordered_block(w3, final)
+	w3.provider.requests.clear()
+	rtc.is_ordered_block(w3, final)
+	assert w3.provider.methods() == []
+
+
+def test_block_cache_never_reads_latest(block_cache):
+	w3 = stub_chain(head=100, latest=50)
+	rtc.scan_blocks(w3, 50, 51)
+	w3.provider.requests.clear()
+
+	# Block 50 is cached, but the 'latest' tag is still fetched every time
+	assert rtc.is_ordered_block(w3, 'latest')
+	assert rtc.is_ordered_block(w3, 'latest')
+	assert w3.provider.methods() == ['eth_getBlockByNumber', 'eth_getBlockByNumber']
+
+
+def test_block_cache_unavailable_falls_back(block_cache, tmp_path, monkeypatch):
+	monkeypatch.setattr(rtc, 'BLOCK_CACHE_PATH', str(tmp_path / 'missing' / 'blocks.sqlite'))
+	w3 = stub_chain()
+	assert rtc.scan_blocks(w3, 10, 12) == {10: True, 11: False}
+	assert rtc.is_ordered_block(w3, 10)
+	assert sorted(w3.provider.methods()) == ['eth_blockNumber'] + ['eth_getBlockByNumber'] * 3
+
+
+def test_block_cache_disabled_by_default(monkeypatch):
+	monkeypatch.setattr(rtc, 'BLOCK_CACHE_PATH', None)
+	w3 = stub_chain()
+	assert rtc.scan_blocks(w3, 10, 12) == {10: True, 11: False}
+	assert sorted(w3.provider.methods()) == ['eth_getBlockByNumber'] * 2
+
+
+def http2_provider(handler, **kwargs):
+	"""
+	Returns an HTTP2Provider whose httpx client is served by handler(request) -> httpx.Response
+	"""
+	httpx = pytest.importorskip('httpx')
+	client = httpx.Client(transport=httpx.MockTransport(handler))
+	return rtc.HTTP2Provider('http://stub.invalid', client, **kwargs)
+
+
+def rpc_response(request, result):
+	body = json.loads(request.content)
+	return {'jsonrpc': '2.0', 'id': body['id'], 'result': result}
+
+
+def test_http2_provider_retries(monkeypatch):
+	httpx = pytest.importorskip('httpx')
+	monkeypatch.setattr(rtc.time, 'sleep', lambda seconds: None)
+	attempts = []
+
+	def handler(request):
+		attempts.append(request)
+		if len(attempts) <= 2:
+			return httpx.Response(500)
+		return httpx.Response(200, json=rpc_response(request, '0x61'))
+
+	provider = http2_provider(handler)
+	assert provider.make_request('eth_chainId', [])['result'] == '0x61'
+	assert len(attempts) == 3
+
+
+def test_http2_provider_retry_limits(monkeypatch):
+	httpx = pytest.importorskip('httpx')
+	monkeypatch.setattr(rtc.time, 'sleep', lambda seconds: None)
+	attempts = []
+
+	def handler(request):
+		attempts.append(request)
+		raise httpx.ConnectError('refused', request=request)
+
+	provider = http2_provider(handler)
+	with pytest.raises(httpx.ConnectError):
+		provider.make_request('eth_getBlockByNumber', ['0x1', True])
+	assert len(attempts) == provider.exception_retry_configuration.retries
+
+	# Methods outside the allowlist are sent once
+	attempts.clear()
+	with pytest.raises(httpx.ConnectError):
+		provider.make_request('debug_traceTransaction', ['0x00'])
+	assert len(attempts) == 1
+
+
+def test_http2_provider_batch_with_null_id():
+	httpx = pytest.importorskip('httpx')
+
+	def handler(request):
+		return httpx.Response(200, json=[
+			{'jsonrpc': '2.0', 'id': None, 'error': {'code': -32600, 'message': 'Invalid request'}},
+			{'jsonrpc': '2.0', 'id': 1, 'result': '0x1'},
+		])
+
+	provider = http2_provider(handler)
+	with pytest.warns(RuntimeWarning):
+		response = provider.make_batch_request([('eth_blockNumber', []), ('eth_chainId', [])])
+	assert [item['id'] for item in response] == [None, 1]
+
+
+def test_http2_provider_rejects_unsupported_request_kwargs():
+	pytest.importorskip('httpx')
+	with pytest.raises(ValueError, match='verify'):
+		http2_provider(lambda request: None, request_kwargs={'verify': False})
+	http2_provider(lambda request: None, request_kwargs={'timeout': 5})
+
+
+def test_http2_client_remembers_missing_h2(monkeypatch):
+	httpx = pytest.importorskip('httpx')
+	created = []
+
+	def client_without_h2(*args, **kwargs):
+		created.append(kwargs)
+		raise ImportError('h2 is not installed')
+
+	monkeypatch.setattr(rtc, '_HTTP2_CLIENT', None)
+	monkeypatch.setattr(httpx, 'Client', client_without_h2)
+	assert rtc.http2_client() is None
+	assert rtc.http2_client() is None
+	assert len(created) == 1